@@ -0,0 +1,19 @@
+from requests_cache import CachedSession
+
+def create_cached_session(headers):
+    """
+    Create a session that caches Aquifer API responses on disk.
+    The cache honors the API's Cache-Control/ETag headers, so repeated runs
+    don't re-download unchanged resources.
+    """
+    session = CachedSession(
+        '.aquifer_cache',
+        backend='sqlite',
+        expire_after=3600,
+        cache_control=True,
+        allowable_methods=('GET',),
+        # Keep the API key out of cache keys and redact it from stored requests
+        ignored_parameters=['api-key']
+    )
+    session.headers.update(headers)
+    return session
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 # /Users/richmahn/repos/aquifer-to-dcs/convert_to_usfm_with_ugnt.py
 
-import json
 import csv
 import os
 import sys
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+# 1 MiB buffer for the mapping CSV and the USFM output
+BUFFER_SIZE = 1 << 20
+
 def usfm_escape(text):
     """
     Escape special characters for USFM compatibility.
@@ -24,13 +31,27 @@ def load_greek_mapping(csv_path):
     """
     mapping = {}
     try:
-        with open(csv_path, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
+        with open(csv_path, 'r', encoding='utf-8', buffering=BUFFER_SIZE) as file:
+            reader = csv.reader(file)
+            header = next(reader, [])
+            
+            # Resolve column positions once; a missing column points at an
+            # always-empty slot just past the header
+            empty = len(header)
+            sblgnt_idx = header.index('SBLGNT:Greek') if 'SBLGNT:Greek' in header else empty
+            ugnt_idx = header.index('UGNT:Greek') if 'UGNT:Greek' in header else empty
+            greek_idx = header.index('Greek') if 'Greek' in header else empty
+            
+            m = mapping
             for row in reader:
-                sblgnt = row.get('SBLGNT:Greek', '') or row.get('Greek', '')
-                ugnt = row.get('UGNT:Greek', '') or row.get('Greek', '')
+                # Pad short rows and drop overflow fields, like DictReader does
+                if len(row) != empty:
+                    row = row[:empty] + [''] * (empty - len(row))
+                row.append('')
+                sblgnt = row[sblgnt_idx] or row[greek_idx]
+                ugnt = row[ugnt_idx] or row[greek_idx]
                 if sblgnt:
-                    mapping[sblgnt] = ugnt
+                    m[sblgnt] = ugnt
         
         if not mapping:
             print(f"Warning: No Greek mappings found in {csv_path}")
@@ -43,8 +64,8 @@ def load_greek_mapping(csv_path):
 def process_aligned_json(json_path, greek_mapping):
     """Process JSON and convert SBLGNT Greek to UGNT Greek."""
     try:
-        with open(json_path, 'r', encoding='utf-8') as file:
-            data = json.load(file)
+        with open(json_path, 'rb') as file:
+            data = json_loads(file.read())
         
         # Print structure to debug
         if not data.get('chapters'):
@@ -71,10 +92,7 @@ def process_aligned_json(json_path, greek_mapping):
                 # Case 2: If there's direct Greek text in the verse
                 if 'greek' in verse:
                     words = verse['greek'].split()
-                    converted_words = []
-                    for word in words:
-                        converted_words.append(greek_mapping.get(word, word))
-                    verse['greek'] = ' '.join(converted_words)
+                    verse['greek'] = ' '.join(map(greek_mapping.get, words, words))
                 
                 # Case 3: If there are tokens directly in the verse
                 if 'tokens' in verse:
@@ -88,9 +106,9 @@ def process_aligned_json(json_path, greek_mapping):
         print(f"Error processing JSON: {e}")
         sys.exit(1)
 
-def generate_usfm(data):
-    """Generate USFM content from processed data."""
-    usfm_lines = [
+def generate_usfm(data, file):
+    """Write USFM content for processed data to an open file."""
+    header = [
         "\\id ACT Unlocked Greek New Testament",
         "\\ide UTF-8",
         "\\h Acts",
@@ -99,46 +117,51 @@ def generate_usfm(data):
         "\\toc3 Act",
         "\\mt1 Acts"
     ]
+    file.write("\n".join(header))
     
     for chapter in data.get('chapters', []):
         chapter_num = chapter.get('number', '?')
-        usfm_lines.append(f"\\c {chapter_num}")
+        file.write(f"\n\\c {chapter_num}")
         
         for verse in chapter.get('verses', []):
-            verse_num = verse.get('number', '?')
-            verse_text = ""
+            vget = verse.get
+            verse_num = vget('number', '?')
+            alignments = vget('alignments')
+            greek = vget('greek')
+            tokens = vget('tokens')
+            text = vget('text')
+            parts = []
             
             # Try different ways to get the Greek text
             
             # Method 1: From alignments
-            if 'alignments' in verse:
-                for alignment in verse['alignments']:
+            if alignments is not None:
+                for alignment in alignments:
                     source_tokens = alignment.get('sourceNgram', [])
                     source_text = " ".join([token.get('text', '') for token in source_tokens])
                     if source_text.strip():
-                        verse_text += source_text + " "
+                        parts.append(source_text)
             
             # Method 2: Direct Greek text
-            elif 'greek' in verse:
-                verse_text += verse['greek'] + " "
+            elif greek is not None:
+                parts.append(greek)
             
             # Method 3: From tokens
-            elif 'tokens' in verse:
-                for token in verse['tokens']:
-                    verse_text += token.get('text', '') + " "
+            elif tokens is not None:
+                parts.extend([token.get('text', '') for token in tokens])
             
             # Method 4: Direct text field
-            elif 'text' in verse:
-                verse_text += verse['text'] + " "
+            elif text is not None:
+                parts.append(text)
+            
+            verse_text = " ".join(parts)
             
             # If we still have no verse text, try a fallback method or warn
             if not verse_text.strip():
                 print(f"Warning: No Greek text found for chapter {chapter_num}, verse {verse_num}")
                 verse_text = "[No Greek text found]"
             
-            usfm_lines.append(f"\\v {verse_num} {usfm_escape(verse_text.strip())}")
-    
-    return "\n".join(usfm_lines)
+            file.write(f"\n\\v {verse_num} {usfm_escape(verse_text.strip())}")
 
 def main():
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -164,13 +187,10 @@ def main():
     print(f"Processing JSON data from {json_path}...")
     processed_data = process_aligned_json(json_path, greek_mapping)
     
-    # Generate the USFM content
+    # Generate the USFM content straight into the output file
     print("Generating USFM content...")
-    usfm_content = generate_usfm(processed_data)
-    
-    # Write to output file
-    with open(output_path, 'w', encoding='utf-8') as file:
-        file.write(usfm_content)
+    with open(output_path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as file:
+        generate_usfm(processed_data, file)
     
     print(f"Successfully generated UGNT-aligned USFM at {output_path}")
 
@@ -1,11 +1,20 @@
 import os
-import json
-import requests
 import random
 import string
 import re
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from aquifer_session import create_cached_session
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Load API key from .env file
 load_dotenv()
@@ -18,11 +27,53 @@ if not API_KEY:
 BASE_URL = "https://api.aquifer.bible"
 HEADERS = {"api-key": API_KEY}
 
+# Books to process; set to None to process all 66 books
+BOOK_CODES = {"ACT"}
+
+# Number of books processed concurrently
+MAX_BOOK_WORKERS = 4
+
+# Number of resources fetched concurrently per book
+MAX_WORKERS = 16
+
+# Buffer size for the TSV output file (1 MiB)
+BUFFER_SIZE = 1 << 20
+
+# Shared session so connections are kept alive and reused across requests,
+# with responses cached on disk
+SESSION = create_cached_session(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    # Room for every resource worker across all concurrent books
+    pool_maxsize=MAX_BOOK_WORKERS * MAX_WORKERS,
+    # Retry transient failures; hand back the final response so callers can report its status
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False
+    )
+))
+
+# Chapter:verse reference at the start of a resource name, e.g. '3:13' or '3:13-15'
+_REF_RE = re.compile(r'([0-9]+:[0-9]+(?:-[0-9]+)?)')
+
+# ID alphabet: a lowercase letter followed by three lowercase letters or digits
+_ID_FIRST = string.ascii_lowercase
+_ID_REST = string.ascii_lowercase + string.digits
+_ID_SPACE = len(_ID_FIRST) * len(_ID_REST) ** 3
+# Stride is coprime with _ID_SPACE, so consecutive counter values map to
+# scattered IDs that do not repeat until the whole space is used
+_ID_STRIDE = 370261
+_id_counter = itertools.count(random.randrange(_ID_SPACE))
+
 def generate_unique_id():
     """Generate a unique 4 character ID starting with lowercase letter"""
-    first_char = random.choice(string.ascii_lowercase)
-    rest_chars = ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(3))
-    return first_char + rest_chars
+    n = next(_id_counter) * _ID_STRIDE % _ID_SPACE
+    n, c3 = divmod(n, len(_ID_REST))
+    n, c2 = divmod(n, len(_ID_REST))
+    c0, c1 = divmod(n, len(_ID_REST))
+    return _ID_FIRST[c0] + _ID_REST[c1] + _ID_REST[c2] + _ID_REST[c3]
 
 def extract_markdown_from_tiptap(content):
     """Extract markdown from the tiptap JSON structure"""
@@ -71,13 +122,14 @@ def extract_support_reference(paragraph):
     
     return ""
 
+@functools.lru_cache(maxsize=4096)
 def extract_reference_from_name(book_name, resource_name):
     """Extract reference (e.g., '3:13') from resource name (e.g., 'Joel 3:13 (#1)')"""
     # Remove the book name from the resource name
     name_without_book = resource_name.replace(book_name, "").strip()
     
     # Extract the reference before any parenthesis
-    match = re.match(r'([0-9]+:[0-9]+(?:-[0-9]+)?)', name_without_book)
+    match = _REF_RE.match(name_without_book)
     if match:
         return match.group(1)
     return name_without_book  # Fallback if pattern doesn't match
@@ -89,7 +141,7 @@ def process_book_notes(book_code, book_name):
     limit = 100
     
     while True:
-        response = requests.get(
+        response = SESSION.get(
             f"{BASE_URL}/resources/search",
             params={
                 "languageId": 1,
@@ -99,8 +151,7 @@ def process_book_notes(book_code, book_name):
                 "endChapter": 150,
                 "limit": limit,
                 "offset": offset
-            },
-            headers=HEADERS
+            }
         )
         
         # Print API request details for debugging
@@ -119,7 +170,7 @@ def process_book_notes(book_code, book_name):
             print(f"Error fetching resources for {book_name}: {response.status_code}")
             return []
         
-        data = response.json()
+        data = json_loads(response.content)
         items = data.get("items", [])
         all_items.extend(items)
         
@@ -135,18 +186,26 @@ def process_book_notes(book_code, book_name):
     
     return all_items
 
-def process_resource(resource_id, book_name):
-    """Process a single resource and return a TSV line"""
-    response = requests.get(
-        f"{BASE_URL}/resources/{resource_id}",
-        headers=HEADERS
-    )
+def fetch_resource(resource_id):
+    """Fetch the full content of a single resource"""
+    response = SESSION.get(f"{BASE_URL}/resources/{resource_id}")
     
     if response.status_code != 200:
         print(f"Error fetching resource {resource_id}: {response.status_code}")
         return None
     
-    data = response.json()
+    return json_loads(response.content)
+
+def process_resource(resource, book_name):
+    """Process a single search result item and return a TSV line"""
+    resource_id = resource.get("id")
+    
+    # Search results currently only carry id/name metadata, so fetch the
+    # content unless the item already includes it
+    data = resource if "content" in resource else fetch_resource(resource_id)
+    if data is None:
+        return None
+    
     resource_name = data.get("name", "")
     reference = extract_reference_from_name(book_name, resource_name)
 
@@ -200,52 +259,63 @@ def process_resource(resource_id, book_name):
     
     return tsv_line
 
+def process_book(book, output_dir):
+    """Fetch all translation notes for a book and write its TSV file"""
+    book_code = book.get("code")
+    book_name = book.get("name")
+    
+    print(f"\nProcessing {book_name} ({book_code})...")
+    
+    # Process all notes for this book
+    resources = process_book_notes(book_code, book_name)
+    
+    if not resources:
+        print(f"No translation notes found for {book_name}")
+        return
+    
+    # Create TSV file for this book
+    tsv_file_path = output_dir / f"{book_code}.tsv"
+    
+    with open(tsv_file_path, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as tsv_file:
+        # Write header
+        tsv_file.write("Reference\tID\tTags\tSupportReference\tQuote\tOccurrence\tNote\n")
+        
+        # Fetch resources concurrently, but write them in their original order
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(process_resource, resource, book_name)
+                for resource in resources
+            ]
+            for future in futures:
+                tsv_line = future.result()
+                
+                if tsv_line:
+                    tsv_file.write(f"{tsv_line}\n")
+    
+    print(f"Created {tsv_file_path} with {len(resources)} translation notes")
+
 def main():
     # Create output directory
     output_dir = Path("./output")
     output_dir.mkdir(exist_ok=True)
     
     # Get Bible books
-    response = requests.get(f"{BASE_URL}/bibles/books", headers=HEADERS)
+    response = SESSION.get(f"{BASE_URL}/bibles/books")
     
     if response.status_code != 200:
         print(f"Error fetching Bible books: {response.status_code}")
         return
     
-    bible_books = response.json()[:66]  # Get only the first 66 books as specified
+    bible_books = json_loads(response.content)[:66]  # Get only the first 66 books as specified
     
-    for book in bible_books:
-        book_code = book.get("code")
-        book_name = book.get("name")
-
-        if book_code != "ACT":
-            continue
-        
-        print(f"\nProcessing {book_name} ({book_code})...")
-        
-        # Process all notes for this book
-        resources = process_book_notes(book_code, book_name)
-        
-        if not resources:
-            print(f"No translation notes found for {book_name}")
-            continue
-        
-        # Create TSV file for this book
-        tsv_file_path = output_dir / f"{book_code}.tsv"
-        
-        with open(tsv_file_path, 'w', encoding='utf-8') as tsv_file:
-            # Write header
-            tsv_file.write("Reference\tID\tTags\tSupportReference\tQuote\tOccurrence\tNote\n")
-            
-            # Process each resource
-            for resource in resources:
-                resource_id = resource.get("id")
-                tsv_line = process_resource(resource_id, book_name)
-                
-                if tsv_line:
-                    tsv_file.write(f"{tsv_line}\n")
-        
-        print(f"Created {tsv_file_path} with {len(resources)} translation notes")
+    if BOOK_CODES is not None:
+        bible_books = [book for book in bible_books if book.get("code") in BOOK_CODES]
+    
+    # Books are independent, so fetch several of them at once
+    with ThreadPoolExecutor(max_workers=MAX_BOOK_WORKERS) as executor:
+        futures = [executor.submit(process_book, book, output_dir) for book in bible_books]
+        for future in futures:
+            future.result()
 
 if __name__ == "__main__":
     main()
@@ -1,7 +1,11 @@
 import os
-import requests
-import json
 from dotenv import load_dotenv
+from aquifer_session import create_cached_session
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
 # Load API key from .env file
 load_dotenv()
@@ -15,15 +19,21 @@ headers = {
     "api-key": API_KEY
 }
 
+# Session with an on-disk response cache shared with create_tn_tsv.py
+session = create_cached_session(headers)
+
+# Buffer size used when saving USFM output (1 MiB)
+BUFFER_SIZE = 1 << 20
+
 def get_bibles_for_english():
     """Fetch all English Bibles (LanguageCode=eng)"""
     url = f"{BASE_URL}/bibles"
     params = {
         "LanguageCode": "eng"
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = session.get(url, params=params)
     if response.status_code == 200:
-        return response.json()
+        return json_loads(response.content)
     else:
         print(f"Error fetching Bibles: {response.status_code}")
         print(response.text)
@@ -42,24 +52,25 @@ def get_bible_text(bible_id, book_code):
     params = {
         "BookCode": book_code
     }
-    response = requests.get(url, headers=headers, params=params)
+    response = session.get(url, params=params)
     if response.status_code == 200:
-        return response.json()
+        return json_loads(response.content)
     else:
         print(f"Error fetching Bible text: {response.status_code}")
         print(response.text)
         return None
 
-def convert_to_usfm(bible_data, book_code):
-    """Convert Bible JSON data to USFM format"""
+def convert_to_usfm(bible_data, book_code, file):
+    """Convert Bible JSON data to USFM format, writing it to an open file"""
     usfm_lines = []
+    book_name = bible_data['bookName']
     
     # Add USFM header
     usfm_lines.append("\\id ACT Acts")
-    usfm_lines.append(f"\\h {bible_data['bookName']}")
+    usfm_lines.append(f"\\h {book_name}")
     usfm_lines.append("\\mt Acts")
-    usfm_lines.append(f"\\toc1 {bible_data['bookName']}")
-    usfm_lines.append(f"\\toc2 {bible_data['bookName']}")
+    usfm_lines.append(f"\\toc1 {book_name}")
+    usfm_lines.append(f"\\toc2 {book_name}")
     usfm_lines.append(f"\\toc3 {book_code}")
     
     # Add USFM header with Bible information
@@ -67,11 +78,13 @@ def convert_to_usfm(bible_data, book_code):
     usfm_lines.append(f"\\rem Bible Abbreviation: {bible_data['bibleAbbreviation']}")
     usfm_lines.append(f"\\rem Bible ID: {bible_data['bibleId']}")
     
+    file.write("\n".join(usfm_lines))
+    
     # Process chapters and verses
     for chapter in bible_data['chapters']:
         chapter_num = chapter['number']
-        usfm_lines.append(f"\n\\c {chapter_num}")
-        usfm_lines.append("\\p")
+        file.write(f"\n\n\\c {chapter_num}")
+        file.write("\n\\p")
         
         for verse in chapter['verses']:
             verse_num = verse['number']
@@ -79,14 +92,12 @@ def convert_to_usfm(bible_data, book_code):
             if verse_num == 0:
                 continue
             verse_text = verse['text']
-            usfm_lines.append(f"\\v {verse_num} {verse_text}")
-    
-    return "\n".join(usfm_lines)
+            file.write(f"\n\\v {verse_num} {verse_text}")
 
-def save_to_file(content, filename):
-    """Save content to a file"""
-    with open(filename, 'w', encoding='utf-8') as file:
-        file.write(content)
+def save_to_file(bible_data, book_code, filename):
+    """Convert Bible data to USFM and save it to a file"""
+    with open(filename, 'w', encoding='utf-8', buffering=BUFFER_SIZE) as file:
+        convert_to_usfm(bible_data, book_code, file)
     print(f"Saved to {filename}")
 
 def main():
@@ -120,12 +131,10 @@ def main():
         print("Failed to retrieve Bible text")
         return
     
+    # Convert to USFM and save to file
     print("Converting to USFM format...")
-    usfm_content = convert_to_usfm(bible_data, book_code)
-    
-    # Save to file
     output_filename = "45-ACT.usfm"
-    save_to_file(usfm_content, output_filename)
+    save_to_file(bible_data, book_code, output_filename)
 
 if __name__ == "__main__":
     main()